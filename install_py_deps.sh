@@ -1,3 +1,3 @@
 #!/bin/bash
 
-pip install vosk tkinter pyaudio sounddevice numpy
+pip install vosk orjson tkinter pyaudio sounddevice
@@ -11,6 +11,9 @@ import argparse
 import sys
 from pathlib import Path
 
+# Translation table mapping spaces to underscores
+_SPACE_TO_UNDERSCORE = str.maketrans({' ': '_'})
+
 def rename_files_with_underscores(directory, dry_run=False):
     """
     Rename all files in directory replacing spaces with underscores.
@@ -33,47 +36,67 @@ def rename_files_with_underscores(directory, dry_run=False):
     renamed_count = 0
     error_count = 0
     
-    # Get all items in directory
-    items = list(directory_path.iterdir())
+    # Get all entries in directory; scandir already knows each entry's type
+    with os.scandir(directory_path) as it:
+        entries = list(it)
     
-    if not items:
+    if not entries:
         print("No files found in directory.")
         return 0, 0
     
     print(f"{'Preview' if dry_run else 'Renaming'} files in: {directory_path.absolute()}")
     print("-" * 50)
     
-    for item in items:
+    # Every name in the directory, so collisions are checked without a stat
+    names = {entry.name for entry in entries}
+    
+    # First pass: build the rename plan in memory
+    plan = []
+    for entry in entries:
         # Skip directories, only process files
-        if item.is_dir():
+        if entry.is_dir():
             continue
-            
-        # Check if filename contains spaces
-        if ' ' in item.name:
-            # Create new filename with underscores
-            new_name = item.name.replace(' ', '_')
-            new_path = item.parent / new_name
-            
-            # Check if target filename already exists
-            if new_path.exists():
-                print(f"SKIP: {item.name} -> {new_name} (target already exists)")
-                error_count += 1
-                continue
-            
-            try:
-                if dry_run:
-                    print(f"DRY RUN: {item.name} -> {new_name}")
-                else:
-                    item.rename(new_path)
-                    print(f"RENAMED: {item.name} -> {new_name}")
-                renamed_count += 1
-            except Exception as e:
-                print(f"ERROR: Could not rename '{item.name}': {e}")
-                error_count += 1
-        else:
+        
+        name = entry.name
+        
+        # Create new filename with underscores in a single pass
+        new_name = name.translate(_SPACE_TO_UNDERSCORE)
+        
+        # Unchanged name means the filename contains no spaces
+        if new_name == name:
             # No spaces in filename, skip it
             if not dry_run:
-                print(f"SKIPPED: {item.name} (no spaces)")
+                print(f"SKIPPED: {name} (no spaces)")
+            continue
+        
+        # Check if target filename already exists or is already planned
+        if new_name in names:
+            print(f"SKIP: {name} -> {new_name} (target already exists)")
+            error_count += 1
+            continue
+        
+        plan.append((name, entry.path, new_name, os.path.join(directory, new_name)))
+        names.add(new_name)
+    
+    # Second pass: apply the plan
+    for name, src, new_name, dst in plan:
+        # The name set is case-sensitive; on case-insensitive filesystems
+        # os.rename would silently replace an existing file
+        if os.path.exists(dst):
+            print(f"SKIP: {name} -> {new_name} (target already exists)")
+            error_count += 1
+            continue
+        
+        try:
+            if dry_run:
+                print(f"DRY RUN: {name} -> {new_name}")
+            else:
+                os.rename(src, dst)
+                print(f"RENAMED: {name} -> {new_name}")
+            renamed_count += 1
+        except Exception as e:
+            print(f"ERROR: Could not rename '{name}': {e}")
+            error_count += 1
     
     print("-" * 50)
     if dry_run:
@@ -2,13 +2,113 @@ import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 import threading
 import os
-import json
+import orjson
+import struct
 import subprocess
-import wave
 import sounddevice as sd
-import numpy as np
 from vosk import Model, KaldiRecognizer
 
+def format_time(seconds):
+    """Convert seconds to SRT time format (HH:MM:SS,mmm)"""
+    millis = int(seconds * 1000)
+    secs, millis = divmod(millis, 1000)
+    minutes, secs = divmod(secs, 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d},{millis:03d}"
+
+def _format_segment(index, segment):
+    """Format a subtitle segment as an SRT block"""
+    return (f"{index}\n"
+            f"{format_time(segment['start'])} --> {format_time(segment['end'])}\n"
+            f"{segment['text']}\n")
+
+def _iter_pcm(path, chunk_bytes=64000):
+    """Yield raw PCM chunks from a mono 16-bit PCM WAV file"""
+    with open(path, "rb") as f:
+        header = f.read(12)
+        if len(header) < 12:
+            raise ValueError("Audio file must be WAV format mono PCM.")
+        riff, _, wave_id = struct.unpack("<4sI4s", header)
+        if riff != b"RIFF" or wave_id != b"WAVE":
+            raise ValueError("Audio file must be WAV format mono PCM.")
+        
+        # Walk the chunks once: validate "fmt " and stop at "data"
+        fmt_seen = False
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                raise ValueError("WAV file has no data chunk.")
+            chunk_id, size = struct.unpack("<4sI", header)
+            if chunk_id == b"data":
+                break
+            body = f.read(size + (size & 1))
+            if chunk_id == b"fmt ":
+                if len(body) < 16:
+                    raise ValueError("Audio file must be WAV format mono PCM.")
+                audio_format, channels, sample_rate = struct.unpack_from("<HHI", body, 0)
+                bits_per_sample, = struct.unpack_from("<H", body, 14)
+                if audio_format != 1 or channels != 1 or bits_per_sample != 16:
+                    raise ValueError("Audio file must be WAV format mono PCM.")
+                # The recognizer is created for 16 kHz audio
+                if sample_rate != 16000:
+                    raise ValueError("Audio file must be sampled at 16000 Hz.")
+                fmt_seen = True
+        
+        if not fmt_seen:
+            raise ValueError("Audio file must be WAV format mono PCM.")
+        
+        # Samples follow directly; no per-read validation needed
+        remaining = size
+        while remaining > 0:
+            data = f.read(min(chunk_bytes, remaining))
+            if not data:
+                return
+            remaining -= len(data)
+            yield data
+
+class PcmRingBuffer:
+    """Single-producer, single-consumer ring buffer of raw PCM bytes"""
+    def __init__(self, capacity):
+        self.buffer = bytearray(capacity)
+        self.view = memoryview(self.buffer)
+        self.capacity = capacity
+        self.head = 0  # Total bytes written, only advanced by the producer
+        self.tail = 0  # Total bytes read, only advanced by the consumer
+        self.ready = threading.Event()
+    
+    def push(self, data):
+        """Copy a bytes-like block into the ring, dropping it if the ring is full"""
+        data = memoryview(data)
+        n = data.nbytes
+        head = self.head
+        if n > self.capacity - (head - self.tail):
+            return False
+        
+        start = head % self.capacity
+        first = min(n, self.capacity - start)
+        self.view[start:start + first] = data[:first]
+        if first < n:
+            self.view[:n - first] = data[first:]
+        
+        self.head = head + n
+        self.ready.set()
+        return True
+    
+    def available(self):
+        """Number of bytes waiting to be read"""
+        return self.head - self.tail
+    
+    def pop(self, n):
+        """Remove n bytes from the ring and return them"""
+        start = self.tail % self.capacity
+        first = min(n, self.capacity - start)
+        data = bytes(self.view[start:start + first])
+        if first < n:
+            data += self.view[:n - first]
+        
+        self.tail += n
+        return data
+
 class SpeechRecognitionApp:
     def __init__(self, root):
         self.root = root
@@ -22,6 +122,11 @@ class SpeechRecognitionApp:
         self.is_recording = False
         self.subtitle_segments = []
         self.recording_stream = None
+        self.recognition_thread = None
+        self.ring = None
+        self.ring_capacity = 16000 * 2 * 10  # 10 seconds of 16-bit microphone audio
+        self.block_size = 4000  # Samples fed to the recognizer at a time
+        self.partial_interval = 4  # Parse partial results every Nth audio block
         
         # Model configuration (assuming models are already downloaded)
         # self.models = {
@@ -105,16 +210,19 @@ class SpeechRecognitionApp:
     def check_models(self):
         """Check if models exist locally"""
         model_dir = "models"
-        missing_models = []
         
-        if not os.path.exists(model_dir):
+        # List the directory once instead of checking each model path
+        try:
+            present = set(os.listdir(model_dir))
+        except FileNotFoundError:
             self.update_status("Models directory not found")
             return False
+        except OSError:
+            # Not a directory or not readable: every model counts as missing
+            present = set()
             
-        for lang, model_name in self.models.items():
-            model_path = os.path.join(model_dir, model_name)
-            if not os.path.exists(model_path):
-                missing_models.append(lang)
+        missing_models = [lang for lang, model_name in self.models.items()
+                          if model_name not in present]
         
         if missing_models:
             self.update_status(f"Missing models: {', '.join(missing_models)}")
@@ -152,7 +260,7 @@ class SpeechRecognitionApp:
                 
             self.update_status("Loading model...")
             self.model = Model(model_path)
-            self.recognizer = KaldiRecognizer(self.model, 16000)
+            self.create_recognizer()
             self.process_btn.config(state=tk.NORMAL)
             self.update_status("Model loaded successfully")
         except Exception as e:
@@ -160,6 +268,12 @@ class SpeechRecognitionApp:
         finally:
             self.progress.stop()
     
+    def create_recognizer(self):
+        """Create a fresh recognizer with word-level timestamps"""
+        self.recognizer = KaldiRecognizer(self.model, 16000)
+        self.recognizer.SetWords(True)
+        return self.recognizer
+    
     def toggle_microphone(self):
         """Toggle microphone recording"""
         if not self.is_recording:
@@ -175,49 +289,94 @@ class SpeechRecognitionApp:
             
         self.is_recording = True
         self.mic_btn.config(text="Stop Microphone")
+        # File processing would share the session's recognizer
+        self.process_btn.config(state=tk.DISABLED)
         self.subtitle_segments = []
         self.transcript_text.delete(1.0, tk.END)
         self.subtitle_text.delete(1.0, tk.END)
         
+        # Timestamps restart at zero for each session
+        self.create_recognizer()
+        
         self.update_status("Recording... Speak now")
         
+        # Start recognition worker
+        self.ring = PcmRingBuffer(self.ring_capacity)
+        self.recognition_thread = threading.Thread(target=self.recognition_worker, daemon=True)
+        self.recognition_thread.start()
+        
         # Start recording
         try:
             def audio_callback(indata, frames, time, status):
-                if self.is_recording and self.recognizer:
-                    # Process audio chunk
-                    audio_chunk = indata[:, 0].astype(np.float32)
-                    if self.recognizer.AcceptWaveform(audio_chunk):
-                        result = json.loads(self.recognizer.Result())
-                        if 'text' in result and result['text']:
-                            self.root.after(0, self.update_transcript, result['text'])
-                            self.root.after(0, self.add_subtitle_segment, result)
-                    else:
-                        partial = self.recognizer.PartialResult()
-                        partial_result = json.loads(partial)
-                        if 'partial' in partial_result:
-                            self.root.after(0, self.update_partial_transcript, partial_result['partial'])
+                # Runs on the audio thread: only copy the raw buffer for the worker
+                if self.is_recording:
+                    self.ring.push(indata)
             
-            self.recording_stream = sd.InputStream(
+            self.recording_stream = sd.RawInputStream(
                 samplerate=16000,
                 channels=1,
-                dtype=np.float32,
+                dtype='int16',
+                blocksize=self.block_size,
                 callback=audio_callback
             )
             self.recording_stream.start()
         except Exception as e:
             self.update_status(f"Recording error: {str(e)}")
     
+    def recognition_worker(self):
+        """Feed recorded audio to the recognizer outside the audio thread"""
+        # Capture this session's ring and recognizer; a restarted session
+        # swaps both while this worker may still be finishing a block
+        ring = self.ring
+        recognizer = self.recognizer
+        block_bytes = self.block_size * 2
+        block_count = 0
+        last_partial = None
+        
+        # Exit once recording stops or a new session replaces the ring
+        while self.is_recording and ring is self.ring:
+            ring.ready.wait()
+            ring.ready.clear()
+            
+            while self.is_recording and ring is self.ring and ring.available() >= block_bytes:
+                data = ring.pop(block_bytes)
+                if recognizer.AcceptWaveform(data):
+                    result = orjson.loads(recognizer.Result())
+                    if 'text' in result and result['text']:
+                        self.root.after(0, self.update_transcript, result['text'])
+                        self.root.after(0, self.add_subtitle_segment, result)
+                    last_partial = None
+                else:
+                    # Partials only feed a label, skip most of them
+                    block_count += 1
+                    if block_count % self.partial_interval:
+                        continue
+                    partial = recognizer.PartialResult()
+                    # Skip silence and unchanged text before parsing or repainting
+                    if '"partial" : ""' in partial or partial == last_partial:
+                        continue
+                    last_partial = partial
+                    partial_result = orjson.loads(partial)
+                    if 'partial' in partial_result:
+                        self.root.after(0, self.update_partial_transcript, partial_result['partial'])
+    
     def stop_recording(self):
         """Stop microphone recording"""
         self.is_recording = False
         self.mic_btn.config(text="Use Microphone")
+        self.process_btn.config(state=tk.NORMAL if self.model else tk.DISABLED)
         
         # Stop recording stream
         if self.recording_stream:
             self.recording_stream.stop()
             self.recording_stream.close()
             self.recording_stream = None
+        
+        # Wake the recognition worker so it can exit; joining here could
+        # deadlock while the worker is waiting on root.after
+        if self.recognition_thread:
+            self.ring.ready.set()
+            self.recognition_thread = None
             
         self.update_status("Recording stopped")
     
@@ -227,6 +386,9 @@ class SpeechRecognitionApp:
             self.update_status("No audio file selected")
             return
             
+        # Microphone would share the file's recognizer
+        self.process_btn.config(state=tk.DISABLED)
+        self.mic_btn.config(state=tk.DISABLED)
         self.progress.start()
         threading.Thread(target=self.process_audio, daemon=True).start()
     
@@ -238,64 +400,66 @@ class SpeechRecognitionApp:
             self.subtitle_text.delete(1.0, tk.END)
             self.subtitle_segments = []
             
-            # Convert to WAV if needed
-            wav_file = self.convert_to_wav(self.audio_file)
+            # Timestamps restart at zero for each file; keep this file's
+            # recognizer even if another one replaces self.recognizer
+            recognizer = self.create_recognizer()
             
-            # Open audio file
-            wf = wave.open(wav_file, "rb")
-            if wf.getnchannels() != 1 or wf.getsampwidth() != 2 or wf.getcomptype() != "NONE":
-                wf.close()
-                raise ValueError("Audio file must be WAV format mono PCM.")
-            
-            # Process audio chunks
-            chunk_size = 4000
-            sample_rate = wf.getframerate()
-            
-            while True:
-                data = wf.readframes(chunk_size)
-                if len(data) == 0:
-                    break
-                    
-                if self.recognizer.AcceptWaveform(data):
-                    result = json.loads(self.recognizer.Result())
+            # Stream decoded audio chunks into the recognizer
+            for data in self.stream_audio(self.audio_file):
+                if recognizer.AcceptWaveform(data):
+                    result = orjson.loads(recognizer.Result())
                     if 'text' in result and result['text']:
                         self.root.after(0, self.update_transcript, result['text'])
                         self.root.after(0, self.add_subtitle_segment, result)
                         
             # Final result
-            final_result = self.recognizer.FinalResult()
-            final_json = json.loads(final_result)
+            final_result = recognizer.FinalResult()
+            final_json = orjson.loads(final_result)
             if 'text' in final_json and final_json['text']:
                 self.root.after(0, self.update_transcript, final_json['text'])
                 self.root.after(0, self.add_subtitle_segment, final_json)
                 
-            wf.close()
             self.update_status("Processing complete")
         except Exception as e:
             self.update_status(f"Processing error: {str(e)}")
         finally:
             self.progress.stop()
+            self.process_btn.config(state=tk.NORMAL)
+            self.mic_btn.config(state=tk.NORMAL)
     
-    def convert_to_wav(self, input_file):
-        """Convert audio file to WAV format"""
-        output_file = "temp_audio.wav"
+    def stream_audio(self, input_file, chunk_size=32000):
+        """Yield 16 kHz mono PCM chunks decoded by ffmpeg through a pipe"""
         try:
-            # Use ffmpeg to convert
-            subprocess.run([
-                "ffmpeg", "-i", input_file, 
-                "-ar", "16000", "-ac", "1", 
-                "-acodec", "pcm_s16le", 
-                output_file, "-y"
-            ], check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-            return output_file
-        except:
+            proc = subprocess.Popen([
+                "ffmpeg", "-nostdin", "-nostats", "-loglevel", "error",
+                "-i", input_file,
+                "-ar", "16000", "-ac", "1",
+                "-f", "s16le", "-acodec", "pcm_s16le",
+                "pipe:1"
+            ], stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        except FileNotFoundError:
             # Fallback: assume it's already WAV
-            return input_file
+            yield from _iter_pcm(input_file, chunk_size)
+            return
+        
+        try:
+            while True:
+                data = proc.stdout.read(chunk_size)
+                if not data:
+                    break
+                yield data
+        finally:
+            proc.stdout.close()
+            returncode = proc.wait()
+        
+        if returncode != 0:
+            raise RuntimeError(f"Failed to decode audio from {input_file}")
     
     def update_transcript(self, text):
         """Update transcript text area"""
-        current = self.transcript_text.get(1.0, tk.END).strip()
-        if current:
+        # The final result replaces the pending partial line
+        self.clear_partial_transcript()
+        if self.transcript_text.compare("end-1c", "!=", "1.0"):
             self.transcript_text.insert(tk.END, "\n" + text)
         else:
             self.transcript_text.insert(tk.END, text)
@@ -303,65 +467,47 @@ class SpeechRecognitionApp:
     
     def update_partial_transcript(self, text):
         """Update with partial recognition result"""
-        current = self.transcript_text.get(1.0, tk.END).strip()
-        lines = current.split('\n')
-        if lines and lines[-1].endswith("(listening...)"):
-            lines[-1] = text + " (listening...)"
-        else:
-            lines.append(text + " (listening...)")
-        self.transcript_text.delete(1.0, tk.END)
-        self.transcript_text.insert(tk.END, '\n'.join(lines))
+        self.clear_partial_transcript()
+        if self.transcript_text.compare("end-1c", "!=", "1.0"):
+            text = "\n" + text
+        self.transcript_text.insert(tk.END, text + " (listening...)", "partial")
         self.transcript_text.see(tk.END)
     
+    def clear_partial_transcript(self):
+        """Remove the partial recognition line, if any"""
+        ranges = self.transcript_text.tag_ranges("partial")
+        if ranges:
+            self.transcript_text.delete(ranges[0], ranges[-1])
+    
     def add_subtitle_segment(self, result):
         """Add subtitle segment"""
         if 'text' in result and result['text']:
-            # Simple timing estimation
-            word_count = len(result['text'].split())
-            duration = max(1, word_count * 0.45)  # Rough estimate
-            
-            # Get last segment end time
-            if self.subtitle_segments:
-                start_time = self.subtitle_segments[-1]['end']
+            # Timing from Vosk word timestamps
+            words = result.get('result') or []
+            if words:
+                start_time = words[0]['start']
+                end_time = words[-1]['end']
+            elif self.subtitle_segments:
+                start_time = end_time = self.subtitle_segments[-1]['end']
             else:
-                start_time = 0
+                start_time = end_time = 0
                 
             segment = {
                 'start': start_time,
-                'end': start_time + duration,
+                'end': end_time,
                 'text': result['text']
             }
             self.subtitle_segments.append(segment)
-            self.update_subtitles()
-    
-    def update_subtitles(self):
-        """Update subtitle text area"""
-        self.subtitle_text.delete(1.0, tk.END)
-        srt_content = self.build_srt()
-        self.subtitle_text.insert(tk.END, srt_content)
-        self.subtitle_text.see(tk.END)
+            
+            # Append only the new block instead of rebuilding the whole SRT
+            block = _format_segment(len(self.subtitle_segments), segment)
+            self.subtitle_text.insert(tk.END, block + "\n")
+            self.subtitle_text.see(tk.END)
     
-    def build_srt(self):
-        """Build SRT content from subtitle segments"""
-        def format_time(seconds):
-            hours = int(seconds // 3600)
-            minutes = int((seconds % 3600) // 60)
-            secs = int(seconds % 60)
-            millis = int((seconds - int(seconds)) * 1000)
-            return f"{hours:02d}:{minutes:02d}:{secs:02d},{millis:03d}"
-        
-        srt_lines = []
-        for i, segment in enumerate(self.subtitle_segments):
-            start_time = format_time(segment['start'])
-            end_time = format_time(segment['end'])
-            srt_lines.extend([
-                str(i + 1),
-                f"{start_time} --> {end_time}",
-                segment['text'],
-                ""
-            ])
-        
-        return "\n".join(srt_lines)
+    def iter_srt(self):
+        """Yield SRT blocks for the subtitle segments, one at a time"""
+        for i, segment in enumerate(self.subtitle_segments, 1):
+            yield _format_segment(i, segment) + "\n"
     
     def download_srt(self):
         """Save subtitles as SRT file"""
@@ -376,8 +522,9 @@ class SpeechRecognitionApp:
         
         if filename:
             try:
-                with open(filename, 'w', encoding='utf-8') as f:
-                    f.write(self.build_srt())
+                # Stream blocks through a large buffer instead of building one string
+                with open(filename, 'w', encoding='utf-8', buffering=1 << 20) as f:
+                    f.writelines(self.iter_srt())
                 self.update_status(f"SRT saved to {filename}")
             except Exception as e:
                 self.update_status(f"Error saving SRT: {str(e)}")
@@ -399,7 +546,6 @@ class SpeechRecognitionApp:
     def update_status(self, message):
         """Update status label"""
         self.status_var.set(message)
-        self.root.update_idletasks()
 
 if __name__ == "__main__":
     root = tk.Tk()
@@ -10,129 +10,207 @@ transcripts and SRT subtitle files.
 import argparse
 import os
 import sys
-import json
+import orjson
 import subprocess
-import wave
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
 from vosk import Model, KaldiRecognizer
 
-def extract_audio(video_path, output_path):
+# Video extensions in both common cases, so most names skip lower()
+VIDEO_EXTENSIONS = frozenset([
+    '.mp4', '.avi', '.mkv', '.mov', '.wmv', '.flv', '.webm',
+    '.MP4', '.AVI', '.MKV', '.MOV', '.WMV', '.FLV', '.WEBM'
+])
+
+# Vosk model loaded once per worker process by _init_worker, or the
+# reason it could not be loaded
+_worker_model = None
+_worker_error = None
+
+def _init_worker(model_path):
     """
-    Extract audio from video file using FFmpeg.
+    Initialize a worker process by loading the Vosk model once.
     
     Args:
-        video_path (str): Path to the input video file
-        output_path (str): Path where the extracted audio will be saved
+        model_path (str): Path to the Vosk model directory
     """
+    global _worker_model, _worker_error
     try:
-        subprocess.run([
-            'ffmpeg', '-i', video_path,
-            '-ar', '16000', '-ac', '1',
-            '-acodec', 'pcm_s16le',
-            output_path, '-y'
-        ], check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-    except subprocess.CalledProcessError:
-        raise RuntimeError(f"Failed to extract audio from {video_path}")
+        _worker_model = Model(model_path)
+    except Exception as e:
+        # Keep the worker alive so each file reports the real cause
+        _worker_error = f"Failed to load Vosk model from '{model_path}': {e}"
 
-def transcribe_audio(model_path, audio_path):
+def transcribe_audio(model, video_path):
     """
-    Transcribe audio file using Vosk model.
+    Transcribe the audio track of a media file using Vosk model.
+    
+    FFmpeg decodes the audio to 16 kHz mono PCM and streams it through a
+    pipe straight into the recognizer, so no temporary WAV file is written.
     
     Args:
-        model_path (str): Path to the Vosk model directory
-        audio_path (str): Path to the audio file to transcribe
+        model (Model): Loaded Vosk model, shared across files
+        video_path (str): Path to the media file to transcribe
         
     Returns:
         list: List of transcription segments with timing information
     """
-    model = Model(model_path)
+    # Fresh recognizer per file so decoder state does not leak between files
     recognizer = KaldiRecognizer(model, 16000)
+    recognizer.SetWords(True)
     
-    wf = wave.open(audio_path, "rb")
-    if wf.getnchannels() != 1 or wf.getsampwidth() != 2 or wf.getcomptype() != "NONE":
-        wf.close()
-        raise ValueError("Audio file must be WAV format mono PCM.")
+    # One decoder thread: videos are already parallelized across processes
+    proc = subprocess.Popen([
+        'ffmpeg', '-nostdin', '-nostats', '-loglevel', 'error',
+        '-threads', '1', '-i', video_path,
+        '-ar', '16000', '-ac', '1',
+        '-f', 's16le', '-acodec', 'pcm_s16le',
+        'pipe:1'
+    ], stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
     
     segments = []
-    chunk_size = 4000
-    
-    while True:
-        data = wf.readframes(chunk_size)
-        if len(data) == 0:
-            break
-            
-        if recognizer.AcceptWaveform(data):
-            result = json.loads(recognizer.Result())
-            if 'text' in result and result['text'].strip():
-                segments.append(result)
+    chunk_size = 32000  # 16000 samples of 16-bit audio
+    
+    try:
+        while True:
+            data = proc.stdout.read(chunk_size)
+            if not data:
+                break
+                
+            if recognizer.AcceptWaveform(data):
+                result = orjson.loads(recognizer.Result())
+                if 'text' in result and result['text'].strip():
+                    segments.append(result)
+    finally:
+        proc.stdout.close()
+        returncode = proc.wait()
+    
+    if returncode != 0:
+        raise RuntimeError(f"Failed to extract audio from {video_path}")
     
     # Final result
     final_result = recognizer.FinalResult()
-    final_json = json.loads(final_result)
+    final_json = orjson.loads(final_result)
     if 'text' in final_json and final_json['text'].strip():
         segments.append(final_json)
     
-    wf.close()
     return segments
 
+def format_time(seconds):
+    """Convert seconds to SRT time format (HH:MM:SS,mmm)"""
+    millis = int(seconds * 1000)
+    secs, millis = divmod(millis, 1000)
+    minutes, secs = divmod(secs, 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d},{millis:03d}"
+
 def generate_srt(segments):
     """
-    Generate SRT subtitle content from transcription segments.
+    Generate SRT subtitle blocks from transcription segments.
     
     Args:
         segments (list): List of transcription segments
         
-    Returns:
-        str: Formatted SRT content
+    Yields:
+        str: Formatted SRT block for each segment
     """
-    def format_time(seconds):
-        """Convert seconds to SRT time format (HH:MM:SS,mmm)"""
-        hours = int(seconds // 3600)
-        minutes = int((seconds % 3600) // 60)
-        secs = int(seconds % 60)
-        millis = int((seconds - int(seconds)) * 1000)
-        return f"{hours:02d}:{minutes:02d}:{secs:02d},{millis:03d}"
-    
-    srt_lines = []
-    cumulative_time = 0
-    
-    for i, segment in enumerate(segments):
-        # Estimate timing based on word count
-        words = segment['text'].split()
-        duration = max(1.0, len(words) * 0.45)  # Rough estimate of duration per word
+    prev_end = 0.0
+    
+    for i, segment in enumerate(segments, 1):
+        # Timing from Vosk word timestamps
+        words = segment.get('result') or []
+        if words:
+            start_time = words[0]['start']
+            end_time = words[-1]['end']
+        else:
+            start_time = end_time = prev_end
         
-        start_time = cumulative_time
-        end_time = cumulative_time + duration
+        yield f"{i}\n{format_time(start_time)} --> {format_time(end_time)}\n{segment['text']}\n\n"
         
-        srt_lines.extend([
-            str(i + 1),
-            f"{format_time(start_time)} --> {format_time(end_time)}",
-            segment['text'],
-            ""
-        ])
+        prev_end = end_time
+
+def _has_video_extension(name):
+    """Check a file name against VIDEO_EXTENSIONS without building a Path."""
+    dot = name.rfind('.')
+    if dot <= 0:
+        return False
+    ext = name[dot:]
+    return ext in VIDEO_EXTENSIONS or ext.lower() in VIDEO_EXTENSIONS
+
+def _entry_size(entry):
+    """Return a directory entry's size, or 0 if it can no longer be read."""
+    try:
+        return entry.stat().st_size
+    except OSError:
+        return 0
+
+def _process_one(video_path, output_dir):
+    """
+    Transcribe and save outputs for a single video file.
+    
+    Runs inside a worker process of process_video_files, using the model
+    loaded once by _init_worker.
+    
+    Args:
+        video_path (str): Path to the input video file
+        output_dir (Path): Directory to save transcripts and subtitles
         
-        cumulative_time = end_time
+    Returns:
+        str: Report of the processing outcome
+    """
+    video_file = Path(video_path)
+    if _worker_model is None:
+        return f"Error processing {video_file.name}: {_worker_error}"
     
-    return "\n".join(srt_lines)
+    try:
+        txt_file = output_dir / f"{video_file.stem}.txt"
+        srt_file = output_dir / f"{video_file.stem}.srt"
+        
+        # Transcribe audio streamed from the video
+        segments = transcribe_audio(_worker_model, video_path)
+        
+        # Generate full transcript
+        full_transcript = " ".join([seg['text'] for seg in segments if 'text' in seg])
+        
+        # Save text transcript
+        with open(txt_file, 'w', encoding='utf-8') as f:
+            f.write(full_transcript)
+        
+        # Generate and save SRT, streaming one block at a time
+        with open(srt_file, 'w', encoding='utf-8', buffering=1 << 20) as f:
+            f.writelines(generate_srt(segments))
+        
+        return f"Processed: {video_file.name} -> {txt_file.name}, {srt_file.name}"
+        
+    except Exception as e:
+        return f"Error processing {video_file.name}: {e}"
 
 def process_video_files(input_dir, output_dir, model_path):
     """
     Process all video files in a directory.
     
+    Each worker process streams a video's audio from ffmpeg into Vosk, so
+    decoding and recognition overlap without a separate extraction stage.
+    
     Args:
         input_dir (str): Directory containing video files
         output_dir (str): Directory to save transcripts and subtitles
         model_path (str): Path to Vosk model
     """
-    video_extensions = {'.mp4', '.avi', '.mkv', '.mov', '.wmv', '.flv', '.webm'}
-    input_path = Path(input_dir)
     output_path = Path(output_dir)
     
     # Create output directory if it doesn't exist
     output_path.mkdir(parents=True, exist_ok=True)
     
-    # Find all video files
-    video_files = [f for f in input_path.iterdir() if f.suffix.lower() in video_extensions]
+    # Find all video files in a single directory scan
+    with os.scandir(input_dir) as it:
+        video_entries = [entry for entry in it
+                         if _has_video_extension(entry.name) and entry.is_file()]
+    
+    # Largest videos first so the last worker is not left with a long one
+    video_entries.sort(key=_entry_size, reverse=True)
+    video_files = [entry.path for entry in video_entries]
     
     if not video_files:
         print("No video files found in the specified directory.")
@@ -140,42 +218,18 @@ def process_video_files(input_dir, output_dir, model_path):
     
     print(f"Found {len(video_files)} video files. Processing...")
     
-    for video_file in video_files:
-        try:
-            print(f"Processing: {video_file.name}")
-            
-            # Define paths for temporary audio and output files
-            audio_file = output_path / f"{video_file.stem}.wav"
-            txt_file = output_path / f"{video_file.stem}.txt"
-            srt_file = output_path / f"{video_file.stem}.srt"
-            
-            # Extract audio
-            print("  Extracting audio...")
-            extract_audio(str(video_file), str(audio_file))
-            
-            # Transcribe audio
-            print("  Transcribing audio...")
-            segments = transcribe_audio(model_path, str(audio_file))
-            
-            # Generate full transcript
-            full_transcript = " ".join([seg['text'] for seg in segments if 'text' in seg])
-            
-            # Save text transcript
-            with open(txt_file, 'w', encoding='utf-8') as f:
-                f.write(full_transcript)
-            
-            # Generate and save SRT
-            srt_content = generate_srt(segments)
-            with open(srt_file, 'w', encoding='utf-8') as f:
-                f.write(srt_content)
-            
-            # Clean up temporary audio file
-            audio_file.unlink()
-            
-            print(f"  Saved: {txt_file.name}, {srt_file.name}")
-            
-        except Exception as e:
-            print(f"  Error processing {video_file.name}: {e}")
+    # Leave half of the cores free for the ffmpeg subprocesses
+    max_workers = max(1, (os.cpu_count() or 2) // 2)
+    
+    with ProcessPoolExecutor(max_workers=max_workers,
+                             initializer=_init_worker,
+                             initargs=(model_path,)) as executor:
+        futures = [executor.submit(_process_one, video_file, output_path)
+                   for video_file in video_files]
+        # Report each video as it finishes, so finished results are shown
+        # even if a worker dies later and breaks the pool
+        for future in as_completed(futures):
+            print(future.result())
     
     print("Processing complete.")
 
@@ -223,6 +277,7 @@ Examples:
     # Check for FFmpeg
     try:
         subprocess.run(['ffmpeg', '-version'], 
+                      stdin=subprocess.DEVNULL, 
                       stdout=subprocess.DEVNULL, 
                       stderr=subprocess.DEVNULL, 
                       check=True)
@@ -231,7 +286,11 @@ Examples:
         sys.exit(1)
     
     # Process videos
-    process_video_files(args.input, args.output, args.model)
+    try:
+        process_video_files(args.input, args.output, args.model)
+    except BrokenProcessPool:
+        print("Error: A worker process terminated unexpectedly (possibly out of memory).", file=sys.stderr)
+        sys.exit(1)
 
 if __name__ == "__main__":
     main()